@@ -1,10 +1,14 @@
 import streamlit as st
 import cv2
 import tempfile
+import shutil
 import numpy as np
 import os
+import torch
 from camera import CameraHandler
-from detector import ObjectDetector
+from batch_processor import BatchProcessor, ResultCache, find_images
+from detector import ObjectDetector, find_model_files
+from deployment_profile import DEFAULT_PROFILE_PATH, load_profile
 from gap_logic import ParkingGapAnalyzer
 
 st.set_page_config(page_title="Parking Slot Detector", layout="wide")
@@ -12,28 +16,114 @@ st.set_page_config(page_title="Parking Slot Detector", layout="wide")
 st.title("🚗 Real-time Parking Slot Scanner")
 st.markdown("### Detect parking availability using generic vehicle detection and geometric gap analysis.")
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Stream uploads to disk 1 MB at a time
+
+
+def save_upload(uploaded_file, suffix: str) -> str:
+    """Stream an uploaded file to a temp file in chunks and return its path. Caller deletes it."""
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tfile:
+        shutil.copyfileobj(uploaded_file, tfile, UPLOAD_CHUNK_SIZE)
+    return tfile.name
+
+
+def load_detector(model_path, conf_threshold: float, profile_mtime=None) -> ObjectDetector:
+    """
+    Keep the model loaded across Streamlit reruns.
+    The detector lives in session_state rather than st.cache_resource because ultralytics
+    predictors are not thread-safe and every browser session runs in its own thread.
+    model_path=None loads the tuned profile; profile_mtime reloads it after re-tuning.
+    """
+    key = (model_path, profile_mtime)
+    if st.session_state.get('detector_key') != key:
+        st.session_state.detector = ObjectDetector(model_path=model_path)
+        st.session_state.detector_key = key
+    detector = st.session_state.detector
+    # The threshold is applied at inference time, so changing it doesn't reload the model
+    detector.conf_threshold = conf_threshold
+    return detector
+
+
+@st.cache_resource
+def load_result_cache() -> ResultCache:
+    return ResultCache()
+
+
+@st.cache_resource
+def apply_thread_count(threads: int) -> int:
+    # torch's thread pool is process-wide, so this is a server-wide deployment setting
+    # taken from the tuned profile, applied once rather than per session or per model choice
+    torch.set_num_threads(threads)
+    return threads
+
+
+def draw_results(frame, detections, gaps):
+    """Draw detections and free gaps onto the frame in place."""
+    height, width, _ = frame.shape
+    # Draw Bounding Boxes
+    for det in detections:
+        x1, y1, x2, y2 = map(int, det['box'])
+        label_text = f"{det['name']} {det['conf']:.2f}"
+        
+        # Color coding: Green for empty (1), Red for others
+        # Check class ID or name. In our custom data 1=empty.
+        color = (0, 0, 255) # Red default
+        if det['class'] == 1 or det['name'] == 'empty':
+            color = (0, 255, 0) # Green
+        
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        
+    # Draw Gaps
+    for gap in gaps:
+        gx1, gx2 = int(gap['start']), int(gap['end'])
+        # Draw a green overlay or line for gaps
+        # We'll calculate a 'floor' y-coordinate. 
+        # Since we don't have 3D info, we'll just draw a strip at the bottom or middle.
+        # Let's draw a semi-transparent green box across the whole height for the gap region
+        overlay = frame.copy()
+        cv2.rectangle(overlay, (gx1, 0), (gx2, height), (0, 255, 0), -1)
+        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+        
+        # Draw text
+        center_x = (gx1 + gx2) // 2
+        cv2.putText(frame, "FREE", (center_x - 20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
+    return frame
+
+
+def count_free_slots(detections, gaps, is_available) -> int:
+    """
+    If we found any "empty" class detections, report available.
+    ALSO consider gap_logic results.
+    """
+    empty_spots = [d for d in detections if d['class'] == 1 or d['name'] == 'empty']
+    if len(empty_spots) > 0 or is_available:
+        return len(empty_spots) + len(gaps)
+    return 0
+
+
 # Sidebar Configuration
 st.sidebar.header("⚙️ Configuration")
 
 # Input Mode Selection
-input_mode = st.sidebar.selectbox("Input Mode", ["Upload Video", "Upload Image", "Live Camera"])
+input_mode = st.sidebar.selectbox("Input Mode", ["Upload Video", "Upload Images", "Image Folder", "Live Camera"])
 
 source = None
+video_upload = None
 if input_mode == "Upload Video":
-    uploaded_file = st.sidebar.file_uploader("Upload a video file", type=["mp4", "avi", "mov"])
-    if uploaded_file is not None:
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-        tfile.write(uploaded_file.read())
-        tfile.close() # Important for Windows
-        source = tfile.name
-elif input_mode == "Upload Image":
-    uploaded_file = st.sidebar.file_uploader("Upload an image", type=["jpg", "png", "jpeg"])
-    if uploaded_file is not None:
-        # Save to temp to use with CameraHandler (or just read directly, but Handler expects path or ID)
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-        tfile.write(uploaded_file.read())
-        tfile.close() # Important for Windows
-        source = tfile.name
+    video_upload = st.sidebar.file_uploader("Upload a video file", type=["mp4", "avi", "mov"])
+    # The upload is only written to disk once processing starts, and removed afterwards
+    source = video_upload
+elif input_mode == "Upload Images":
+    uploaded_files = st.sidebar.file_uploader("Upload images", type=["jpg", "png", "jpeg"], accept_multiple_files=True)
+    if uploaded_files:
+        source = [(f.name, f.getvalue()) for f in uploaded_files]
+elif input_mode == "Image Folder":
+    image_dir = st.sidebar.text_input("Image folder path")
+    if image_dir and os.path.isdir(image_dir):
+        source = find_images(image_dir) or None
+    elif image_dir:
+        st.sidebar.warning(f"Folder not found: {image_dir}")
 elif input_mode == "Live Camera":
     cam_id = st.sidebar.number_input("Camera ID (default 0)", value=0, step=1)
     source = int(cam_id)
@@ -41,20 +131,30 @@ elif input_mode == "Live Camera":
 # Detection Settings
 st.sidebar.subheader("Detection Parameters")
 # Model Selection
-model_files = [f for f in os.listdir('.') if f.endswith('.pt')]
-# Also check runs/detect for best.pt
-for root, dirs, files in os.walk("runs"):
-    for file in files:
-        if file.endswith(".pt") and "best" in file:
-            model_files.append(os.path.join(root, file))
+model_files = find_model_files()
 
 if not model_files:
     model_files = ["yolov8n.pt"]
 
-selected_model = st.sidebar.selectbox("Select Model Source", model_files)
+# A profile written by tune.py is offered first, so it is used by default
+profile = load_profile()
+if profile is not None and profile.get('threads'):
+    apply_thread_count(profile['threads'])
+model_options = {}
+if profile is not None:
+    profile_label = f"Tuned profile ({os.path.basename(profile['model'])}, {profile['backend']}, imgsz={profile['imgsz']})"
+    model_options[profile_label] = None
+model_options.update({f: f for f in model_files})
+
+selected_label = st.sidebar.selectbox("Select Model Source", list(model_options))
+selected_model = model_options[selected_label]
+profile_mtime = os.path.getmtime(DEFAULT_PROFILE_PATH) if profile is not None else None
 
 conf_threshold = st.sidebar.slider("Confidence Threshold", 0.1, 1.0, 0.25, 0.05)
 min_gap_width = st.sidebar.slider("Min Gap Width (Pixels)", 10, 500, 100, 10, help="Minimum width in pixels required for a parking spot. Calibrate this based on your camera view.")
+is_batch = input_mode in ("Upload Images", "Image Folder")
+if is_batch:
+    batch_size = st.sidebar.slider("Batch Size", 1, 32, 8, 1, help="Number of images sent to the model per inference call.")
 
 start_button = st.sidebar.button("Start / Restart Processing")
 
@@ -64,76 +164,77 @@ st_status = st.empty()
 
 if start_button and source is not None:
     # Initialize Modules
+    temp_path = None
+    camera = None
     try:
-        detector = ObjectDetector(model_path=selected_model, conf_threshold=conf_threshold)
-
+        detector = load_detector(selected_model, conf_threshold, profile_mtime)
         gap_analyzer = ParkingGapAnalyzer(min_gap_width=min_gap_width)
-        camera = CameraHandler(source)
-        
-        st_status.info("Starting processing...")
-        
-        for frame in camera.get_frame():
-            # Run Detection
-            detections = detector.detect(frame)
-            
-            # Analyze Gaps
-            height, width, _ = frame.shape
-            is_available, gaps = gap_analyzer.analyze_availability(detections, width)
+
+        if is_batch:
+            processor = BatchProcessor(detector, gap_analyzer, batch_size=batch_size, cache=load_result_cache())
+            st_status.info(f"Processing {len(source)} images...")
+            progress = st.progress(0.0)
+            grid = st.columns(3)
+            available_count = 0
+            cached_count = 0
+
+            for i, result in enumerate(processor.process(source)):
+                progress.progress((i + 1) / len(source))
+                if result['frame'] is None:
+                    st.warning(result['error'])
+                    continue
+
+                free_slots = count_free_slots(result['detections'], result['gaps'], result['is_available'])
+                available_count += free_slots > 0
+                cached_count += result['cached']
+
+                frame = draw_results(result['frame'], result['detections'], result['gaps'])
+                caption = f"{os.path.basename(result['name'])}: " + (f"{free_slots} free" if free_slots else "full")
+                grid[i % len(grid)].image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), channels="RGB", caption=caption)
+
+            st_status.success(
+                f"**{available_count} / {len(source)} images have a free slot** "
+                f"({cached_count} served from cache)"
+            )
+        else:
+            if video_upload is not None:
+                suffix = os.path.splitext(video_upload.name)[1] or ".mp4"
+                temp_path = save_upload(video_upload, suffix)
+                camera = CameraHandler(temp_path)
+            else:
+                camera = CameraHandler(source)
             
-            # Visualization
-            # Draw Bounding Boxes
-            for det in detections:
-                x1, y1, x2, y2 = map(int, det['box'])
-                label_text = f"{det['name']} {det['conf']:.2f}"
-                
-                # Color coding: Green for empty (1), Red for others
-                # Check class ID or name. In our custom data 1=empty.
-                color = (0, 0, 255) # Red default
-                if det['class'] == 1 or det['name'] == 'empty':
-                    color = (0, 255, 0) # Green
-                
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, label_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-            # Draw Gaps
-            for gap in gaps:
-                gx1, gx2 = int(gap['start']), int(gap['end'])
-                # Draw a green overlay or line for gaps
-                # We'll calculate a 'floor' y-coordinate. 
-                # Since we don't have 3D info, we'll just draw a strip at the bottom or middle.
-                # Let's draw a semi-transparent green box across the whole height for the gap region
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (gx1, 0), (gx2, height), (0, 255, 0), -1)
-                cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-                
-                # Draw text
-                center_x = (gx1 + gx2) // 2
-                cv2.putText(frame, "FREE", (center_x - 20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
-
-            # Update Status Text
-            # Update Status Text
-            # If we found any "empty" class detections, report available.
-            # ALSO consider gap_logic results if desired.
-            empty_spots = [d for d in detections if d['class'] == 1 or d['name'] == 'empty']
+            st_status.info("Starting processing...")
             
-            if len(empty_spots) > 0 or is_available:
-                count = len(empty_spots) + len(gaps)
-                st_status.success(f"**PARKING SLOT AVAILABLE** (Found {count} slots)")
-            else:
-                st_status.error("**NO PARKING SLOT AVAILABLE**")
+            for frame in camera.get_frame():
+                # Run Detection
+                detections = detector.detect(frame)
                 
-            # Convert BGR to RGB for Streamlit
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            st_frame.image(frame_rgb, channels="RGB")
-            
-            # Stop condition for single images to avoid flicker
-            if camera.is_image:
-                break
+                # Analyze Gaps
+                height, width, _ = frame.shape
+                is_available, gaps = gap_analyzer.analyze_availability(detections, width)
                 
-        camera.release()
+                # Visualization
+                draw_results(frame, detections, gaps)
+
+                # Update Status Text
+                free_slots = count_free_slots(detections, gaps, is_available)
+                if free_slots > 0:
+                    st_status.success(f"**PARKING SLOT AVAILABLE** (Found {free_slots} slots)")
+                else:
+                    st_status.error("**NO PARKING SLOT AVAILABLE**")
+                    
+                # Convert BGR to RGB for Streamlit
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                st_frame.image(frame_rgb, channels="RGB")
         
     except Exception as e:
         st.error(f"Error: {e}")
+    finally:
+        if camera is not None:
+            camera.release()
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 elif start_button and source is None:
     st.warning("Please select a valid input source.")
 else:
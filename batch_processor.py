@@ -0,0 +1,149 @@
+import cv2
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Generator, Iterable, Optional, Tuple, Union
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+# A source is either a path on disk or an in-memory (name, bytes) pair, e.g. from an upload.
+ImageSource = Union[str, Path, Tuple[str, bytes]]
+
+
+def find_images(directory: str) -> List[str]:
+    """Recursively collect image paths under a directory, sorted for a stable order."""
+    return sorted(
+        str(p) for p in Path(directory).rglob('*')
+        if p.suffix.lower() in IMAGE_EXTENSIONS and p.is_file()
+    )
+
+
+class ResultCache:
+    """
+    Memoizes detections on disk, one JSON file per key.
+    Keys are derived from the image content hash and the model/threshold settings,
+    so re-running the same images with the same model skips inference entirely.
+    """
+    def __init__(self, cache_dir: str = ".cache/results"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, entry: List[Dict[str, Any]]):
+        # Write to a unique temp file first so an interrupted run never leaves a truncated entry
+        # and concurrent sessions writing the same key don't clobber each other's temp file
+        with tempfile.NamedTemporaryFile('w', dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            json.dump(entry, f)
+        os.replace(f.name, self._path(key))
+
+
+class BatchProcessor:
+    """
+    Runs still images through the detector and gap analyzer in batches.
+    Images are read and decoded in a thread pool (cv2 releases the GIL while decoding),
+    and detections are cached by content hash so unchanged inputs are never re-inferred.
+    Gap analysis is cheap, so it is recomputed on every run rather than cached.
+    """
+    def __init__(self, detector, gap_analyzer, batch_size: int = 8,
+                 max_workers: Optional[int] = None, cache: Optional[ResultCache] = None):
+        self.detector = detector
+        self.gap_analyzer = gap_analyzer
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else ResultCache()
+
+    def _settings_fingerprint(self) -> str:
+        """Describe everything besides the image that affects the detections."""
+        model_path = str(self.detector.model_path)
+        # Include size/mtime so retraining into the same best.pt invalidates old entries
+        try:
+            stat = os.stat(model_path)
+            model_id = f"{model_path}:{stat.st_size}:{int(stat.st_mtime)}"
+        except OSError:
+            model_id = model_path
+        return f"{model_id}|imgsz={self.detector.imgsz}|conf={self.detector.conf_threshold}"
+
+    @staticmethod
+    def _load(source: ImageSource) -> Tuple[str, Optional[str], Optional[np.ndarray]]:
+        """
+        Read, hash and decode a single image. Runs inside the worker pool.
+        Unreadable files come back with frame=None so they are reported without aborting the batch.
+        """
+        if isinstance(source, tuple):
+            name, data = source
+        else:
+            name = str(source)
+            try:
+                with open(source, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return name, None, None
+        digest = hashlib.sha256(data).hexdigest()
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return name, digest, frame
+
+    def _analyze(self, frame: np.ndarray, detections: List[Dict[str, Any]]) -> Dict[str, Any]:
+        _, width, _ = frame.shape
+        is_available, gaps = self.gap_analyzer.analyze_availability(detections, width)
+        return {'detections': detections, 'gaps': gaps, 'is_available': is_available}
+
+    def _run_chunk(self, loaded: List[Tuple[str, Optional[str], Optional[np.ndarray]]],
+                   fingerprint: str) -> Generator[Dict[str, Any], None, None]:
+        """Serve cache hits, run one detector batch over the misses, and yield in input order."""
+        cached_detections: List[Optional[List[Dict[str, Any]]]] = []
+        misses = []
+        for i, (name, digest, frame) in enumerate(loaded):
+            detections = None
+            if frame is not None:
+                key = hashlib.sha256(f"{digest}|{fingerprint}".encode()).hexdigest()
+                detections = self.cache.get(key)
+                if detections is None:
+                    misses.append((i, key, frame))
+            cached_detections.append(detections)
+
+        all_detections = list(cached_detections)
+        if misses:
+            batch_detections = self.detector.detect_batch([frame for _, _, frame in misses])
+            for (i, key, _), detections in zip(misses, batch_detections):
+                self.cache.put(key, detections)
+                all_detections[i] = detections
+
+        for i, (name, _, frame) in enumerate(loaded):
+            if frame is None:
+                yield {'name': name, 'frame': None, 'error': f"Could not read or decode image {name}"}
+            else:
+                yield {'name': name, 'frame': frame, 'cached': cached_detections[i] is not None,
+                       **self._analyze(frame, all_detections[i])}
+
+    def process(self, sources: Iterable[ImageSource]) -> Generator[Dict[str, Any], None, None]:
+        """
+        Yields one result per source, in input order:
+        {'name': str, 'frame': np.ndarray, 'detections': [...], 'gaps': [...],
+         'is_available': bool, 'cached': bool}
+        Sources that cannot be decoded are yielded with frame=None and an 'error' message.
+        """
+        sources = list(sources)
+        fingerprint = self._settings_fingerprint()
+        chunks = [sources[i:i + self.batch_size] for i in range(0, len(sources), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # Decode the next chunk in the background while the current one is being inferred,
+            # keeping at most two chunks of frames in memory.
+            upcoming = [pool.submit(self._load, s) for s in chunks[0]] if chunks else []
+            for n in range(len(chunks)):
+                current = upcoming
+                upcoming = [pool.submit(self._load, s) for s in chunks[n + 1]] if n + 1 < len(chunks) else []
+                yield from self._run_chunk([f.result() for f in current], fingerprint)
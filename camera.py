@@ -1,5 +1,4 @@
 import cv2
-import time
 from typing import Dict, Any, Generator, Optional, Union
 import numpy as np
 
@@ -27,19 +26,12 @@ class CameraHandler:
     def get_frame(self) -> Generator[np.ndarray, None, None]:
         """
         Yields frames from the source.
-        If source is an image, yields the same image repeatedly (simulating a stream) 
-        but handles control flow to not busy-loop too fast in a real app if needed, 
-        or just yields it once depending on usage. 
-        For this streaming app, we might want to just return it once per call or handle in UI.
-        Here we simply read from the cap.
+        If source is an image, it is yielded exactly once; use BatchProcessor
+        for running many still images through the detector.
+        Otherwise frames are read from the cap until the stream ends.
         """
         if self.is_image:
-            # If it's an image, we just return it. 
-            # In a loop context, the caller needs to decide when to stop.
-            # But for compatibility with the loop structure, we can yield it.
-            while True:
-                yield self.image
-                time.sleep(0.1) # Prevent CPU hogging
+            yield self.image
         else:
             while self.cap.isOpened():
                 ret, frame = self.cap.read()
@@ -0,0 +1,155 @@
+import cv2
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional, Sequence
+
+HASH_SIZE = 8  # 8x8 difference hash -> 64-bit fingerprint
+
+
+def dhash(image_path: Path, hash_size: int = HASH_SIZE) -> Optional[int]:
+    """
+    Difference hash: shrink to (hash_size+1) x hash_size grayscale and record whether
+    each pixel is brighter than its right neighbour. Robust to blur, resizing and
+    small lighting changes, which is what separates consecutive screenshots.
+    Returns None if the image cannot be read.
+    """
+    image = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+    value = 0
+    for bit in diff.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+    Lets us find all hashes within a radius without comparing against every image.
+    """
+    def __init__(self):
+        self.root = None  # node: [hash, [item ids], {distance: child node}]
+
+    def add(self, value: int, item: int):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value: int, radius: int) -> List[int]:
+        """Return ids of all items whose hash is within `radius` of `value`."""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                found.extend(node[1])
+            # Triangle inequality: only children at distance d +- radius can match
+            for child_d, child in node[2].items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+        return found
+
+
+def compute_hashes(image_paths: Sequence[Path], max_workers: Optional[int] = None) -> List[Optional[int]]:
+    """Hash all images in parallel (cv2 releases the GIL while decoding)."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(dhash, image_paths))
+
+
+def cluster_near_duplicates(image_paths: Sequence[Path], max_distance: int = 6,
+                            max_workers: Optional[int] = None, linkage: str = 'single') -> List[List[Path]]:
+    """
+    Group near-identical images into clusters.
+    Images are only compared against others in the same folder, so an 'empty'
+    frame is never merged with a 'parked' one. Unreadable images form their own
+    singleton cluster.
+
+    linkage='single': clusters are transitive (if A~B and B~C they end up together even
+    when A and C are further apart), so a slowly changing sequence collapses into one
+    cluster. Use this to keep whole sequences in one split. Each cluster is sorted.
+    linkage='leader': images are visited in the given order; each joins the closest
+    existing leader within max_distance or becomes a new leader. Every member is then a
+    true near-duplicate of its cluster's first path (the leader), so only other members
+    are safe to drop. Order the input so preferred representatives come first.
+    """
+    if linkage not in ('single', 'leader'):
+        raise ValueError(f"Unknown linkage {linkage!r}, expected 'single' or 'leader'")
+    image_paths = list(image_paths)
+    hashes = compute_hashes(image_paths, max_workers)
+
+    if linkage == 'leader':
+        leader_trees: Dict[Path, BKTree] = defaultdict(BKTree)
+        members: Dict[int, List[Path]] = {}
+        for i, (path, h) in enumerate(zip(image_paths, hashes)):
+            nearby = leader_trees[path.parent].query(h, max_distance) if h is not None else []
+            if nearby:
+                members[min(nearby, key=lambda j: hamming(h, hashes[j]))].append(path)
+            else:
+                members[i] = [path]
+                if h is not None:
+                    leader_trees[path.parent].add(h, i)
+        return list(members.values())
+
+    # Union-find over image indices
+    parent = list(range(len(image_paths)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    trees: Dict[Path, BKTree] = defaultdict(BKTree)
+    for i, (path, h) in enumerate(zip(image_paths, hashes)):
+        if h is None:
+            continue
+        tree = trees[path.parent]
+        for j in tree.query(h, max_distance):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+        tree.add(h, i)
+
+    groups: Dict[int, List[Path]] = defaultdict(list)
+    for i, path in enumerate(image_paths):
+        groups[find(i)].append(path)
+    return sorted((sorted(group) for group in groups.values()), key=lambda g: g[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate images in a dataset")
+    parser.add_argument("source", type=str, help="Dataset root folder")
+    parser.add_argument("--max-distance", type=int, default=6, help="Max Hamming distance between hashes to count as duplicates")
+    parser.add_argument("--linkage", type=str, default="leader", choices=["single", "leader"], help="'leader' matches what prepare_dataset drops; 'single' shows whole chained sequences")
+
+    args = parser.parse_args()
+
+    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+    images = [p for p in Path(args.source).rglob('*') if p.suffix.lower() in image_extensions]
+    clusters = cluster_near_duplicates(sorted(images), args.max_distance, linkage=args.linkage)
+    print(f"{len(images)} images -> {len(clusters)} unique clusters")
+    for cluster in clusters:
+        if len(cluster) > 1:
+            print(f"{len(cluster):4d}  {cluster[0]}")
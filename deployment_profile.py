@@ -0,0 +1,27 @@
+import json
+import os
+from typing import Dict, Any, Optional
+
+# Written by tune.py, read by ObjectDetector and the app when no model is given explicitly
+DEFAULT_PROFILE_PATH = "deployment_profile.json"
+
+
+def load_profile(path: str = DEFAULT_PROFILE_PATH) -> Optional[Dict[str, Any]]:
+    """
+    Load a tuned deployment profile.
+    Returns None if the profile does not exist, cannot be parsed,
+    or points at weights that are no longer on disk.
+    """
+    try:
+        with open(path, 'r') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(profile.get('weights', '')):
+        return None
+    return profile
+
+
+def save_profile(profile: Dict[str, Any], path: str = DEFAULT_PROFILE_PATH):
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
@@ -1,42 +1,94 @@
 from ultralytics import YOLO
 import numpy as np
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Optional
+from deployment_profile import DEFAULT_PROFILE_PATH, load_profile
+
+
+def find_model_files(root: str = ".") -> List[str]:
+    """List .pt weights in `root` plus any trained best.pt under runs/."""
+    model_files = [f for f in os.listdir(root) if f.endswith('.pt')]
+    # Also check runs/detect for best.pt
+    for dirpath, dirs, files in os.walk(os.path.join(root, "runs")):
+        for file in files:
+            if file.endswith(".pt") and "best" in file:
+                model_files.append(os.path.join(dirpath, file))
+    return model_files
+
 
 class ObjectDetector:
     """
     Wrapper for YOLOv8 model to detect vehicles.
+    If no model_path is given, the tuned deployment profile written by tune.py is used
+    (weights, backend, input size and batch limit), falling back to yolov8n.pt.
+    The profile's thread count is exposed as `threads` but not applied here, because
+    torch.set_num_threads is process-wide; the entry point (e.g. app.py) applies it.
     """
-    def __init__(self, model_path: str = "yolov8n.pt", conf_threshold: float = 0.25):
+    def __init__(self, model_path: Optional[str] = None, conf_threshold: float = 0.25,
+                 imgsz: Optional[int] = None, profile_path: str = DEFAULT_PROFILE_PATH):
+        self.profile = load_profile(profile_path) if model_path is None else None
+        # Largest number of frames the backend accepts per call; None means unlimited
+        self.max_batch = None
+        self.threads = None
+        if self.profile is not None:
+            model_path = self.profile['weights']
+            imgsz = imgsz or self.profile['imgsz']
+            self.max_batch = self.profile.get('max_batch')
+            self.threads = self.profile.get('threads')
+        elif model_path is None:
+            model_path = "yolov8n.pt"
+
         # Initialize YOLO model. This will download the model if not present.
-        self.model = YOLO(model_path)
+        self.model_path = model_path
+        self.model = YOLO(model_path, task='detect')
         self.conf_threshold = conf_threshold
+        # None keeps the ultralytics default input size (640)
+        self.imgsz = imgsz
         # COCO classes for vehicles (car, motorcycle, bus, truck)
         # COCO classes: 2=car, 3=motorcycle, 5=bus, 7=truck
         # Custom trained classes: 0=car, 1=empty
         self.vehicle_classes = [0, 1, 2, 3, 5, 7] 
 
+    def _predict(self, source):
+        kwargs = {'imgsz': self.imgsz} if self.imgsz else {}
+        return self.model(source, conf=self.conf_threshold, verbose=False, **kwargs)
+
+    def _parse_result(self, result) -> List[Dict[str, Any]]:
+        """Convert a single ultralytics result into our detection dicts."""
+        detections = []
+        for box in result.boxes:
+            cls_id = int(box.cls[0])
+            if cls_id in self.vehicle_classes:
+                x1, y1, x2, y2 = box.xyxy[0].tolist()
+                conf = float(box.conf[0])
+                detections.append({
+                    'box': [x1, y1, x2, y2],
+                    'class': cls_id,
+                    'conf': conf,
+                    'name': self.model.names[cls_id]
+                })
+        return detections
+
     def detect(self, frame: np.ndarray) -> List[Dict[str, Any]]:
         """
         Run inference on a frame.
         Returns a list of detections: {'box': [x1, y1, x2, y2], 'class': int, 'conf': float}
         """
-        results = self.model(frame, conf=self.conf_threshold, verbose=False)
+        results = self._predict(frame)
         detections = []
         
         for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                cls_id = int(box.cls[0])
-                if cls_id in self.vehicle_classes:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    conf = float(box.conf[0])
-                    detections.append({
-                        'box': [x1, y1, x2, y2],
-                        'class': cls_id,
-                        'conf': conf,
-                        'name': self.model.names[cls_id]
-                    })
-        return detections
+            detections.extend(self._parse_result(result))
         return detections
 
-
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """
+        Run inference on several frames, in as few model calls as the backend allows.
+        Returns one list of detections per input frame, in the same order.
+        """
+        step = self.max_batch or max(len(frames), 1)
+        detections = []
+        for i in range(0, len(frames), step):
+            results = self._predict(frames[i:i + step])
+            detections.extend(self._parse_result(result) for result in results)
+        return detections
@@ -4,8 +4,9 @@ from ultralytics import YOLO
 import cv2
 from pathlib import Path
 from tqdm import tqdm
+from dedup import cluster_near_duplicates
 
-def prepare_dataset(source_root, target_root):
+def prepare_dataset(source_root, target_root, dedup_distance=6, keep_duplicates=False):
     """
     Converts a classification-style dataset to YOLO detection format.
     Structure expected:
@@ -20,16 +21,20 @@ def prepare_dataset(source_root, target_root):
     target_root/
         images/train
         labels/train
+
+    Sequential screenshots are mostly near-duplicates, so images are first clustered
+    by perceptual hash (see dedup.py). By default only images within dedup_distance of
+    a kept representative are dropped. With keep_duplicates=True every image is kept,
+    but each chained sequence goes wholly into train or val so near-identical frames
+    cannot leak across splits. Set dedup_distance=None to disable clustering.
+
+    The images/ and labels/ split folders under target_root are emptied first, so
+    files from earlier runs cannot survive as duplicates or leak across splits.
     """
     
     # Initialize auto-labeler (using the base model)
     model = YOLO('yolov8n.pt') 
     
-    # Create target directories
-    for split in ['train', 'val']:
-        os.makedirs(os.path.join(target_root, 'images', split), exist_ok=True)
-        os.makedirs(os.path.join(target_root, 'labels', split), exist_ok=True)
-
     # Collect all image paths
     image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
     all_images = []
@@ -44,14 +49,44 @@ def prepare_dataset(source_root, target_root):
         if file_path.suffix.lower() in image_extensions:
             all_images.append(file_path)
 
-    print(f"Found {len(all_images)} images. Processing...")
+    print(f"Found {len(all_images)} images.")
+
+    source_count = len(all_images)
+    if dedup_distance is None:
+        clusters = [[p] for p in all_images]
+    elif keep_duplicates:
+        print("Clustering near-duplicate sequences...")
+        clusters = cluster_near_duplicates(all_images, dedup_distance, linkage='single')
+        print(f"{source_count} images form {len(clusters)} near-duplicate sequences.")
+    else:
+        print("Clustering near-duplicate images...")
+        # Visit manually labeled images first so they become the kept leaders and hand labels are not lost
+        ordered = sorted(all_images, key=lambda p: (not p.with_suffix('.txt').exists(), p))
+        clusters = cluster_near_duplicates(ordered, dedup_distance, linkage='leader')
+        clusters = [cluster[:1] for cluster in clusters]
 
-    # We will put everything in 'train' for now, user can split manually if desired or we can do random split
-    # For simplicity, let's put 80% in train, 20% in val
+    # Start from empty split folders so stale files from earlier runs don't stay on disk
+    for split in ['train', 'val']:
+        for kind in ['images', 'labels']:
+            split_dir = os.path.join(target_root, kind, split)
+            if os.path.isdir(split_dir):
+                shutil.rmtree(split_dir)
+            os.makedirs(split_dir)
+
+    # Split by cluster rather than by image so duplicates stay in one split.
+    # 80% of images in train, 20% in val
     import random
-    random.shuffle(all_images)
-    split_idx = int(len(all_images) * 0.8)
-    
+    random.shuffle(clusters)
+    total = sum(len(cluster) for cluster in clusters)
+    all_images = []
+    split_idx = 0
+    for cluster in clusters:
+        if len(all_images) < total * 0.8:
+            split_idx += len(cluster)
+        all_images.extend(cluster)
+
+    print(f"Processing {len(all_images)} images...")
+
     # Process
     for i, img_path in enumerate(tqdm(all_images)):
         subset = 'train' if i < split_idx else 'val'
@@ -108,7 +143,10 @@ def prepare_dataset(source_root, target_root):
                             # If data.yaml has "0: car", we typically map all vehicles to 0.
                             f.write(f"0 {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
 
-    print(f"\nDataset prepared at {target_root}")
+    written = sum(len(os.listdir(os.path.join(target_root, 'images', split))) for split in ['train', 'val'])
+    removed = source_count - written
+    print(f"\nDataset prepared at {target_root}: {written} images from {source_count} source images "
+          f"({removed} dropped, {removed / max(source_count, 1):.1%} smaller).")
     print("IMPORTANT: The 'parked' images were auto-labeled using the standard YOLOv8n model.")
     print("This is good for domain adaptation (teaching the model your specific camera angles and lighting).")
     print("However, if the standard model completely fails to see cars in your 'night' or 'rainy' images,")
@@ -0,0 +1,196 @@
+from ultralytics import YOLO
+import argparse
+import os
+import shutil
+import statistics
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import cv2
+import torch
+import yaml
+from detector import find_model_files
+from deployment_profile import DEFAULT_PROFILE_PATH, save_profile
+
+# Inference backends we know how to export to, and the name ultralytics gives the export
+# relative to the weights' stem. 'pytorch' runs the .pt file directly.
+BACKENDS = {
+    'pytorch': None,
+    'torchscript': '.torchscript',
+    'onnx': '.onnx',
+    'openvino': '_openvino_model',
+}
+# Exported with dynamic input shapes so the app's batch mode can send several frames per call
+DYNAMIC_BACKENDS = {'onnx', 'openvino'}
+# Largest batch each backend accepts; None means unlimited. TorchScript is traced at batch 1.
+MAX_BATCH = {'pytorch': None, 'torchscript': 1, 'onnx': None, 'openvino': None}
+# Only these backends run inference on torch's CPU thread pool, so only they are swept over thread counts
+TORCH_BACKENDS = {'pytorch', 'torchscript'}
+
+
+def export_weights(model_path: str, backend: str, imgsz: int) -> str:
+    """
+    Export the .pt weights for a backend at the given input size, reusing a previous export
+    unless the weights have been retrained since.
+    Exports are renamed to <stem>_<imgsz><suffix> so different sizes don't overwrite each other.
+    """
+    if backend == 'pytorch':
+        return model_path
+    stem = Path(model_path).stem
+    target = os.path.join(os.path.dirname(model_path), f"{stem}_{imgsz}{BACKENDS[backend]}")
+    if not os.path.exists(target) or os.path.getmtime(model_path) > os.path.getmtime(target):
+        exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=backend in DYNAMIC_BACKENDS,
+                                           verbose=False)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(exported, target)
+    return target
+
+
+def load_frames(image_dir: str, limit: int) -> List:
+    images = sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in ('.png', '.jpg', '.jpeg', '.bmp', '.webp'))
+    frames = [cv2.imread(str(p)) for p in images[:limit]]
+    return [f for f in frames if f is not None]
+
+
+def measure_latency(model, frames: List, imgsz: int, warmup: int = 3) -> Dict[str, float]:
+    """Time end-to-end single-frame inference (pre/post-processing included), in milliseconds."""
+    for frame in frames[:warmup]:
+        model(frame, imgsz=imgsz, verbose=False)
+    timings = []
+    for frame in frames:
+        start = time.perf_counter()
+        model(frame, imgsz=imgsz, verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    mean_ms = statistics.mean(timings)
+    return {
+        'latency_ms': round(mean_ms, 2),
+        'p90_ms': round(timings[int(0.9 * (len(timings) - 1))], 2),
+        'fps': round(1000 / mean_ms, 2),
+    }
+
+
+def class_names(names) -> Dict[int, str]:
+    """Normalize ultralytics/data.yaml class names (list or {id: name}) to {id: name}."""
+    if isinstance(names, dict):
+        return {int(k): v for k, v in names.items()}
+    return dict(enumerate(names))
+
+
+def load_dataset_names(data_path: str) -> Dict[int, str]:
+    with open(data_path, 'r') as f:
+        return class_names(yaml.safe_load(f)['names'])
+
+
+def measure_accuracy(model, data_path: str, imgsz: int) -> Dict[str, float]:
+    metrics = model.val(data=data_path, imgsz=imgsz, split='val', plots=False, verbose=False)
+    return {'map50': round(float(metrics.box.map50), 4), 'map50_95': round(float(metrics.box.map), 4)}
+
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Configurations not beaten on both p90 latency (lower) and mAP50-95 (higher) by any other."""
+    front = []
+    for r in results:
+        dominated = any(
+            o['p90_ms'] <= r['p90_ms'] and o['map50_95'] >= r['map50_95']
+            and (o['p90_ms'] < r['p90_ms'] or o['map50_95'] > r['map50_95'])
+            for o in results
+        )
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=lambda r: r['p90_ms'])
+
+
+def tune(model_files: List[str], backends: List[str], sizes: List[int], thread_counts: List[int],
+         data_path: str, image_dir: str, num_frames: int = 30) -> List[Dict[str, Any]]:
+    """Sweep models x backends x imgsz x threads and measure each configuration."""
+    frames = load_frames(image_dir, num_frames)
+    if not frames:
+        raise ValueError(f"No images found in {image_dir}")
+
+    # mAP is only meaningful when the model predicts the dataset's class ids,
+    # e.g. COCO yolov8n.pt (2=car) cannot be scored against our 0=car, 1=empty labels
+    dataset_names = load_dataset_names(data_path)
+
+    # Backends outside torch still do pre/post-processing (including NMS) in torch,
+    # so they are timed with torch's default thread count, which is what gets recorded.
+    default_threads = torch.get_num_threads()
+    results = []
+    try:
+        for model_path in model_files:
+            try:
+                model_names = class_names(YOLO(model_path).names)
+            except Exception as e:
+                print(f"Skipping {model_path}: {e}")
+                continue
+            if model_names != dataset_names:
+                print(f"Skipping {model_path}: its classes {model_names} don't match {data_path} {dataset_names}")
+                continue
+
+            for backend in backends:
+                for imgsz in sizes:
+                    try:
+                        weights = export_weights(model_path, backend, imgsz)
+                        model = YOLO(weights, task='detect')
+                        # mAP does not depend on the thread count, so validate once per export
+                        accuracy = measure_accuracy(model, data_path, imgsz)
+
+                        for threads in (thread_counts if backend in TORCH_BACKENDS else [default_threads]):
+                            torch.set_num_threads(threads)
+                            latency = measure_latency(model, frames, imgsz)
+                            result = {
+                                'model': model_path, 'backend': backend, 'weights': weights,
+                                'imgsz': imgsz, 'threads': threads, 'max_batch': MAX_BATCH[backend],
+                                **latency, **accuracy,
+                            }
+                            print(f"{model_path} [{backend}, imgsz={imgsz}, threads={threads}]: "
+                                  f"{result['latency_ms']} ms (p90 {result['p90_ms']} ms), mAP50-95 {result['map50_95']}")
+                            results.append(result)
+                    except Exception as e:
+                        print(f"Skipping {model_path} [{backend}, imgsz={imgsz}]: {e}")
+    finally:
+        torch.set_num_threads(default_threads)
+    return results
+
+
+def select_profile(results: List[Dict[str, Any]], budget_ms: float) -> Optional[Dict[str, Any]]:
+    """Most accurate Pareto-optimal configuration whose p90 latency fits the budget."""
+    candidates = [r for r in pareto_front(results) if r['p90_ms'] <= budget_ms]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda r: (r['map50_95'], -r['p90_ms']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the most accurate model/backend/input size that fits a latency budget")
+    parser.add_argument("--budget-ms", type=float, required=True, help="Per-frame (p90) latency budget in milliseconds")
+    parser.add_argument("--data", type=str, default="data.yaml", help="Path to data.yaml used for val-split mAP")
+    parser.add_argument("--images", type=str, default="formatted_dataset/images/val", help="Images used for timing")
+    parser.add_argument("--models", type=str, nargs="+", help="Weights to sweep (default: all .pt files found, as in the app)")
+    parser.add_argument("--backends", type=str, nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[320, 480, 640], help="Input sizes to sweep")
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}), help="CPU thread counts to sweep")
+    parser.add_argument("--frames", type=int, default=30, help="Number of frames to time per configuration")
+    parser.add_argument("--output", type=str, default=DEFAULT_PROFILE_PATH, help="Where to write the profile")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f"Error: Data file {args.data} not found.")
+    else:
+        models = args.models or find_model_files() or ["yolov8n.pt"]
+        results = tune(models, args.backends, args.imgsz, args.threads, args.data, args.images, args.frames)
+        best = select_profile(results, args.budget_ms)
+        if not results:
+            print("Error: no configuration could be measured; see the skipped models above.")
+        elif best is None:
+            fastest = min(results, key=lambda r: r['p90_ms']) if results else None
+            print(f"Error: no configuration meets the {args.budget_ms} ms budget."
+                  + (f" Fastest was {fastest['p90_ms']} ms." if fastest else ""))
+        else:
+            profile = {**best, 'budget_ms': args.budget_ms, 'pareto': pareto_front(results)}
+            save_profile(profile, args.output)
+            print(f"\nSelected {best['model']} [{best['backend']}, imgsz={best['imgsz']}, threads={best['threads']}]: "
+                  f"p90 {best['p90_ms']} ms, mAP50-95 {best['map50_95']}")
+            print(f"Profile written to {args.output}")